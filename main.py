@@ -1,6 +1,11 @@
+from bisect import insort
+from calendar import isleap
 from collections import UserDict
-from datetime import datetime, timedelta
+from datetime import date, datetime
+from functools import lru_cache
 import pickle
+import re
+import sys
 
 def save_data(book, filename="addressbook.pkl"):
     with open(filename, "wb") as f:
@@ -13,17 +18,39 @@ def load_data(filename="addressbook.pkl"):
     except FileNotFoundError:
         return AddressBook()
 
+_PHONE_RE = re.compile(r"\d{10}")
+
+# Days to add to a weekday() to land on a working day (Sat -> +2, Sun -> +1)
+_WEEKEND_SHIFT = (0, 0, 0, 0, 0, 2, 1)
+
+_EXIT_CMDS = frozenset(("close", "exit"))
+
 class ValidationException(Exception):
     pass
 
+def _slot_state(state):
+    # Slotted objects pickle as (None, slots); books saved before __slots__
+    # was added hold a plain __dict__ instead
+    if isinstance(state, tuple):
+        state = state[1]
+    return state or {}
+
 class Field:
+    __slots__ = ("value",)
+
     def __init__(self, value):
         self.value = value
 
+    def __setstate__(self, state):
+        for key, value in _slot_state(state).items():
+            setattr(self, key, value)
+
     def __str__(self):
         return str(self.value)
 
 class Name(Field):
+    __slots__ = ()
+
     def __init__(self, value):
         super().__init__(value)
         self.validate_name(value)
@@ -33,103 +60,258 @@ class Name(Field):
             raise ValidationException("Name must contain only letters")
 
 class Phone(Field):
+    __slots__ = ()
+
     def __init__(self, value):
         super().__init__(value)
         self.validate_phone(value)
 
     def validate_phone(self, value):
-        if not value.isdigit() or len(value) != 10:
+        if not _PHONE_RE.fullmatch(value):
             raise ValidationException("Phone number must be 10 digits")
 
 class Birthday(Field):
+    __slots__ = ("month", "day", "_dmy")
+
     def __init__(self, value):
         try:
-            self.value = datetime.strptime(value, "%d.%m.%Y").date()
+            # Fixed DD.MM.YYYY shape, parsed by hand rather than with strptime
+            d, m, y = value.split(".")
+            if not (value.isascii() and d.isdigit() and m.isdigit() and y.isdigit()):
+                raise ValueError
+            if len(d) > 2 or len(m) > 2 or len(y) != 4:
+                raise ValueError
+            self.value = date(int(y), int(m), int(d))
         except ValueError:
             raise ValidationException("Invalid date format. Use DD.MM.YYYY")
+        self._cache_parts()
+
+    def _cache_parts(self):
+        self.month = self.value.month
+        self.day = self.value.day
+        self._dmy = self.value.strftime("%d.%m.%Y")
+
+    def __setstate__(self, state):
+        # Older pickles only carry the date, so rebuild the cached parts
+        self.value = _slot_state(state)["value"]
+        self._cache_parts()
 
 class Record:
+    __slots__ = ("name", "phones", "birthday", "_phones_str", "_books")
+
     def __init__(self, name):
         self.name = Name(name)
-        self.phones = []
+        self.phones = {}
         self.birthday = None
+        # Joined phone numbers, rebuilt lazily after the phones change
+        self._phones_str = None
+        # AddressBooks holding this record, told about birthday changes
+        self._books = []
+
+    def __getstate__(self):
+        return {"name": self.name, "phones": self.phones, "birthday": self.birthday}
+
+    def __setstate__(self, state):
+        state = _slot_state(state)
+        self.name = state["name"]
+        self.phones = state["phones"]
+        if isinstance(self.phones, list):
+            # Phones used to be a list of Phone objects
+            self.phones = {p.value: p for p in self.phones}
+        self.birthday = state.get("birthday")
+        self._phones_str = None
+        self._books = []
         
     def add_phone(self, phone):
-        self.phones.append(Phone(phone))
+        self.phones[phone] = Phone(phone)
+        self._phones_str = None
 
     def edit_phone(self, old_phone, new_phone):
-        for p in self.phones:
-            if p.value == old_phone:
-                p.value = new_phone
+        p = self.phones.pop(old_phone, None)
+        if p is not None:
+            p.value = new_phone
+            self.phones[new_phone] = p
+            self._phones_str = None
     
     def find_phone(self, phone):
-        for p in self.phones:
-            if p.value == phone:
-                return p
-        return None
+        return self.phones.get(phone)
     
     def remove_phone(self, phone):
-        for p in self.phones:
-            if p.value == phone:
-                self.phones.remove(p)
+        if self.phones.pop(phone, None) is not None:
+            self._phones_str = None
+
+    def phones_str(self):
+        if self._phones_str is None:
+            # Keys are the phone numbers, so join them directly
+            self._phones_str = '; '.join(self.phones)
+        return self._phones_str
 
     def add_birthday(self, birthday):
+        old_birthday = self.birthday
         self.birthday = Birthday(birthday)
+        for book in self._books:
+            book._birthday_changed(self, old_birthday)
         
         
     def show_birthday(self):
         if self.birthday:
-            return self.birthday.value.strftime("%d.%m.%Y")
+            return self.birthday._dmy
         return "Birthday not set"
 
     def __str__(self):
         birthday_str = f", birthday: {self.show_birthday()}" if self.birthday else ""
-        return f"Contact name: {self.name.value}, phones: {'; '.join(p.value for p in self.phones)}{birthday_str}"
+        return f"Contact name: {self.name.value}, phones: {self.phones_str()}{birthday_str}"
 
 
 class AddressBook(UserDict):
+    def __init__(self, *args, **kwargs):
+        # (month, day, name) entries for contacts with a birthday, bucketed
+        # by month (index 0 is unused) and kept sorted within each bucket
+        self._by_month = [[] for _ in range(13)]
+        # (today's ordinal, result tuple) of the last get_upcoming_birthdays
+        # call, dropped whenever contacts or birthdays change; never shared
+        # between books, since copies start from __init__
+        self._upcoming_cache = None
+        super().__init__(*args, **kwargs)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # The birthday buckets and the cached query result are rebuilt on load
+        del state["_by_month"]
+        del state["_upcoming_cache"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._reindex()
+
+    def __copy__(self):
+        # Records are shared with the copy, but it gets its own index and cache
+        return self.__class__(self.data)
+
+    def __setitem__(self, name, record):
+        old = self.data.get(name)
+        if old is not None:
+            self._unlink(old)
+        self.data[name] = record
+        self._link(record)
+        if record.birthday:
+            self._insert_birthday(record.name.value, record.birthday)
+        self._upcoming_cache = None
+
+    def __delitem__(self, name):
+        self._unlink(self.data.pop(name))
+        self._upcoming_cache = None
+
     def add_record(self, record):
-        self.data[record.name.value] = record
+        self[record.name.value] = record
     
     def find(self, name):
         return self.data.get(name)
 
     def delete(self, name):
-        del self.data[name]
+        del self[name]
+
+    def _reindex(self):
+        self._by_month = [[] for _ in range(13)]
+        self._upcoming_cache = None
+        for record in self.data.values():
+            self._link(record)
+            if record.birthday:
+                self._insert_birthday(record.name.value, record.birthday)
+
+    def _link(self, record):
+        # Books are unhashable, so compare by identity
+        if not any(book is self for book in record._books):
+            record._books.append(self)
+
+    def _unlink(self, record):
+        if record.birthday:
+            self._remove_birthday(record.name.value, record.birthday)
+        record._books = [book for book in record._books if book is not self]
+
+    def _insert_birthday(self, name, birthday):
+        insort(self._by_month[birthday.month], (birthday.month, birthday.day, name))
+
+    def _remove_birthday(self, name, birthday):
+        bucket = self._by_month[birthday.month]
+        key = (birthday.month, birthday.day, name)
+        if key in bucket:
+            bucket.remove(key)
+
+    def _birthday_changed(self, record, old_birthday):
+        # Called by Record.add_birthday for records stored in this book
+        if old_birthday:
+            self._remove_birthday(record.name.value, old_birthday)
+        self._insert_birthday(record.name.value, record.birthday)
+        self._upcoming_cache = None
+
+    def add_birthday(self, name, birthday):
+        record = self.find(name)
+        if record is None:
+            raise KeyError('Contact not found.')
+        record.add_birthday(birthday)
+        return "Birthday added"
 
     def get_upcoming_birthdays(self):
         today = datetime.now().date()
+        today_ord = today.toordinal()
+        if self._upcoming_cache and self._upcoming_cache[0] == today_ord:
+            return self._upcoming_dicts(self._upcoming_cache[1])
+
+        year, next_year = today.year, today.year + 1
+        window_end_ord = today_ord + 7
+        end = date.fromordinal(window_end_ord)
         upcoming_birthdays = []
-        
-        for record in self.data.values():
-            if not record.birthday:
-                continue
-                        
-            birthday = record.birthday.value            
+        append = upcoming_birthdays.append
+        # Formatted dates, shared by contacts celebrating on the same day
+        formatted = {}
+
+        # The 7-day window touches at most this month and the next one
+        candidates = self._by_month[today.month]
+        if end.month != today.month:
+            candidates = candidates + self._by_month[end.month]
+
+        # Day a Feb 29 birthday falls on this year and next year
+        feb29_this_year = 29 if isleap(year) else 28
+        feb29_next_year = 29 if isleap(next_year) else 28
 
-            this_year_birthday = birthday.replace(year=today.year)
+        for month, day, name in candidates:
+            is_feb29 = month == 2 and day == 29
+            this_year_ord = date(year, month, feb29_this_year if is_feb29 else day).toordinal()
 
             # If birthday is in the past, move it to next year
-            if this_year_birthday < today:
-                this_year_birthday = this_year_birthday.replace(year=today.year + 1)
+            if this_year_ord < today_ord:
+                this_year_ord = date(next_year, month, feb29_next_year if is_feb29 else day).toordinal()
 
             # Check if birthday is in the next 7 days
-            if 0 <= (this_year_birthday - today).days <= 7:
-                congratulation_date = this_year_birthday
+            if this_year_ord <= window_end_ord:
+                congratulation_ord = this_year_ord
 
                 # If birthday is on Saturday or Sunday, move it to Monday
-                if congratulation_date.weekday() == 5:  # Sateday
-                    congratulation_date += timedelta(days=2)
-                elif congratulation_date.weekday() == 6:  # Sunday
-                    congratulation_date += timedelta(days=1)
-
-                upcoming_birthdays.append({
-                    "name": record.name.value,
-                    "birthday": congratulation_date.strftime("%d.%m.%Y"),
-                    "congratulation_date": congratulation_date.strftime("%Y.%m.%d")
-                })
-                
-        return upcoming_birthdays
+                # (ordinal 1 is a Monday, so the weekday is (ordinal - 1) % 7)
+                congratulation_ord += _WEEKEND_SHIFT[(congratulation_ord - 1) % 7]
+
+                if congratulation_ord not in formatted:
+                    congratulation_date = date.fromordinal(congratulation_ord)
+                    formatted[congratulation_ord] = (
+                        congratulation_date.strftime("%d.%m.%Y"),
+                        congratulation_date.strftime("%Y.%m.%d"),
+                    )
+                birthday_str, congratulation_str = formatted[congratulation_ord]
+
+                append((name, birthday_str, congratulation_str))
+
+        self._upcoming_cache = (today_ord, tuple(upcoming_birthdays))
+        return self._upcoming_dicts(upcoming_birthdays)
+
+    @staticmethod
+    def _upcoming_dicts(upcoming):
+        # The cache keeps tuples, so callers always get their own dicts
+        return [
+            {"name": name, "birthday": birthday_str, "congratulation_date": congratulation_str}
+            for name, birthday_str, congratulation_str in upcoming
+        ]
 
     def add_contact(self, name, phone=None):
         record = self.find(name)
@@ -154,7 +336,7 @@ class AddressBook(UserDict):
         record = self.find(name)
         if record is None:
             raise KeyError('Contact not found.')
-        return '; '.join(phone.value for phone in record.phones)
+        return record.phones_str()
 
     def show_all(self):
         if not self.data:
@@ -173,23 +355,25 @@ def input_error(func):
 
 # ! Handlers
 
+def _argc(args, n, msg):
+    # Wrong argument count is the common error, so report it without raising
+    return None if len(args) == n else msg
+
 @input_error
 def handle_add_birthday(args, book):
-    if len(args) != 2:
-        raise IndexError('Please provide contact name and birthday date.')
+    err = _argc(args, 2, 'Please provide contact name and birthday date.')
+    if err:
+        return err
     print('args: ', args)
 
     name, date = args
-    record = book.find(name)
-    if not record:
-        raise KeyError('Contact not found.')
-    record.add_birthday(date)
-    return "Birthday added"
+    return book.add_birthday(name, date)
 
 @input_error
 def handle_show_birthday(args, book):
-    if len(args) != 1:
-        raise IndexError('Please provide contact name.')
+    err = _argc(args, 1, 'Please provide contact name.')
+    if err:
+        return err
     name = args[0]
     record = book.find(name)
     if not record:
@@ -209,41 +393,61 @@ def handle_birthdays(args, book):
 @input_error
 def handle_add_contact(args, book):
     print('args: ', args)
-    if len(args) != 2:
-        raise IndexError('Please provide contact name and phone number.')
+    err = _argc(args, 2, 'Please provide contact name and phone number.')
+    if err:
+        return err
     name = args[0]
     phone = args[1] if len(args) > 1 else None
     return book.add_contact(name, phone)
 
 @input_error
 def handle_change_contact(args, book):
-    if len(args) != 3:
-        raise IndexError('Please provide contact name, old phone number and new phone number.')
+    err = _argc(args, 3, 'Please provide contact name, old phone number and new phone number.')
+    if err:
+        return err
     name, old_phone, new_phone = args
     return book.change_contact(name, old_phone, new_phone)
 
 @input_error
 def handle_show_phone(args, book):
-    if len(args) != 1:
-        raise IndexError('Please provide contact name.')
+    err = _argc(args, 1, 'Please provide contact name.')
+    if err:
+        return err
     name = args[0]
     return book.show_phone(name)
 
 @input_error
-def handle_show_all(book):
+def handle_show_all(args, book):
     return book.show_all()
 
-def parse_input(user_input):
+HANDLERS = {
+    "add": handle_add_contact,
+    "change": handle_change_contact,
+    "phone": handle_show_phone,
+    "all": handle_show_all,
+    "add-birthday": handle_add_birthday,
+    "show-birthday": handle_show_birthday,
+    "birthdays": handle_birthdays,
+}
+
+@lru_cache(maxsize=128)
+def _parse_input_cached(user_input):
     if not user_input.strip():
-        return "", []
+        return "", ()
     cmd, *args = user_input.split()
     cmd = cmd.strip().lower()
-    args = [arg.strip() for arg in args]  # Clean up each argument
+    args = tuple(arg.strip() for arg in args)  # Clean up each argument
     return cmd, args
 
+def parse_input(user_input):
+    # Cached results are shared, so hand out a fresh list of args each time
+    cmd, args = _parse_input_cached(user_input)
+    return cmd, list(args)
+
 def main():
     filename="my_address_book.pkl"
     book = load_data(filename)
+    write = sys.stdout.write
     print("Welcome to the assistant bot!")
     while True:
         user_input = input("Enter a command: ")
@@ -253,25 +457,14 @@ def main():
             print("Please enter a command")
             continue
 
-        if command in ["close", "exit"]:
+        if command in _EXIT_CMDS:
             print("Good bye!")
             break
         elif command == "hello":
             print("How can I help you?")
-        elif command == "add":
-            print(handle_add_contact(args, book))
-        elif command == "change":
-            print(handle_change_contact(args, book))
-        elif command == "phone":
-            print(handle_show_phone(args, book))
-        elif command == "all":
-            print(handle_show_all(book))
-        elif command == "add-birthday":
-            print(handle_add_birthday(args, book))
-        elif command == "show-birthday":
-            print(handle_show_birthday(args, book))
-        elif command == "birthdays":
-            print(handle_birthdays(args, book))
+        elif command in HANDLERS:
+            write(HANDLERS[command](args, book))
+            write("\n")
         else:
             print("Invalid command.")
 